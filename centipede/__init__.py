@@ -0,0 +1,8 @@
+""" Engine of the centipede_game app
+
+centipede_game only declares its oTree models and page classes; the game logic
+lives in centipede.engine and is driven by the GameConfig of the game played
+in each round, from the games list of the session config.
+"""
+
+from .config import GAMES, GameConfig, schedule
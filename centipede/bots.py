@@ -0,0 +1,72 @@
+from otree.api import Bot, Submission, SubmissionMustFail, expect
+
+from .config import round_map
+from .engine import app_module, game_config, game_round, live_mode, matching, num_games
+
+
+class PlayerBot(Bot):
+    """ Plays every game of the session; the case is the node at which the mover takes
+
+    Every mover before that node passes (games with fewer nodes end with the
+    take at their last node), so the cases together cover each take/pass path
+    of the games.
+    """
+
+    def play_round(self):
+        app = app_module(self.player)
+        config, node = game_round(self.player)
+        if config is None:
+            return
+        take_node = min(self.case, config.num_nodes)
+
+        if self.round_number == 1:
+            yield SubmissionMustFail(app.Welcome, dict(identification='  '))
+            yield app.Welcome, dict(identification=f'Bot {self.participant.id_in_session}')
+            yield app.Instructions
+
+        if node > take_node:
+            return
+
+        if live_mode(self.player):
+            # the moves are made by call_live_method, the page submits itself once the game ends
+            if node == 1:
+                yield Submission(app.LiveDecision, check_html=False)
+                yield app.Results
+                expect(self.player.payoff_final, config.payoff(take_node, config.role(self.player.id_in_group)))
+                if config.game == num_games(self.player):
+                    self.check_partners()
+            return
+
+        if self.player.id_in_group == config.mover(node):
+            if node == config.num_nodes:
+                yield SubmissionMustFail(app.Decision, dict(take=False))
+            yield app.Decision, dict(take=node == take_node)
+
+        if node == take_node:
+            yield app.Results
+            expect(self.player.payoff_final, config.payoff(node, config.role(self.player.id_in_group)))
+            if config.game == num_games(self.player):
+                self.check_partners()
+
+    def check_partners(self):
+        """ The partners of every game are the ones picked by the matching mode, see engine.pair_arrivals """
+        mode = matching(self.player)
+        first_rounds = [r for r, (_, node) in enumerate(round_map(self.session.config.get('games')), start=1) if node == 1]
+        partners = [self.player.in_round(r).get_others_in_group()[0].participant.code for r in first_rounds]
+        if mode == 'arrival':
+            expect(len(set(partners)), 1)
+        elif mode == 'stranger':
+            expect(self.participant.vars['partners'], partners)
+            if self.session.num_participants <= 4:
+                # so few pairs always leave new partners until everybody has been one
+                fresh = partners[:self.session.num_participants - 1]
+                expect(len(set(fresh)), len(fresh))
+
+
+def call_live_method(method, group, case, **kwargs):
+    """ Play the game of LiveDecision like PlayerBot, taking at the case's node """
+    config = game_config(group)
+    take_node = min(case, config.num_nodes)
+    for node in range(1, take_node + 1):
+        state = method(config.mover(node), dict(take=node == take_node))[0]
+        expect(state['game_on'], node < take_node)
@@ -0,0 +1,103 @@
+from dataclasses import dataclass
+from functools import lru_cache
+
+from .payoffs import payoff_table
+
+
+@dataclass(frozen=True)
+class GameConfig:
+    """ Parameters of one centipede game """
+
+    game: int
+    first_mover: int = 1  # id_in_group of the player who moves on odd nodes
+    large_pile: int = 30
+    small_pile: int = 10
+    base: int = 2
+    num_nodes: int = 6
+
+    @property
+    def payoffs(self):
+        """ Shared payoff table of these parameters, see payoff_table """
+        return payoff_table(self.large_pile, self.small_pile, self.base, self.num_nodes)
+
+    def payoff(self, node, role):
+        """ Payoff of a role when the game ends at this node (num_nodes + 1 if nobody took) """
+        return self.payoffs[node - 1, role - 1].item()
+
+    def take_payoffs(self, node):
+        """ (large pile, small pile) when the mover takes at this node """
+        taker = self.node_role(node)
+        return self.payoff(node, taker), self.payoff(node, 3 - taker)
+
+    def node_role(self, node):
+        """ Role of the player who decides at this node """
+        return 1 if node % 2 != 0 else 2
+
+    def mover(self, node):
+        """ id_in_group of the player who decides at this node """
+        return self.first_mover if node % 2 != 0 else 3 - self.first_mover
+
+    def role(self, id_in_group):
+        """ 1 for the first mover of this game, 2 for the second mover """
+        return 1 if id_in_group == self.first_mover else 2
+
+
+# the original design: four games with the default piles, games 2 and 4 swap
+# who moves first
+DEFAULT_GAMES = [
+    dict(first_mover=1),
+    dict(first_mover=2),
+    dict(first_mover=1),
+    dict(first_mover=2),
+]
+
+
+def schedule(games=None):
+    """ GameConfig of each game, numbered from 1, of the games list of a session config
+
+    Each entry holds GameConfig parameters other than game and an optional
+    repeat count (default 1); entries with a repeat count are expanded into
+    that many consecutive games.
+    """
+    return _schedule(_key(games or DEFAULT_GAMES))
+
+
+def round_map(games=None):
+    """ (GameConfig, node) of each round of the single app; every game takes num_nodes rounds """
+    return _round_map(_key(games or DEFAULT_GAMES))
+
+
+def max_rounds(session_configs):
+    """ Rounds needed by the longest games list among the session configs """
+    return max(len(round_map(config.get('games'))) for config in session_configs)
+
+
+def session_schedule(name):
+    """ schedule of the session config called name in settings.SESSION_CONFIGS, for tools outside oTree """
+    from settings import SESSION_CONFIGS
+
+    config = next(c for c in SESSION_CONFIGS if c['name'] == name)
+    return schedule(config.get('games'))
+
+
+def _key(games):
+    # session configs hold lists of dicts, lru_cache needs something hashable
+    return tuple(tuple(sorted(spec.items())) for spec in games)
+
+
+@lru_cache(maxsize=None)
+def _schedule(games):
+    configs = []
+    for spec in map(dict, games):
+        repeat = spec.pop('repeat', 1)
+        for _ in range(repeat):
+            configs.append(GameConfig(game=len(configs) + 1, **spec))
+    return tuple(configs)
+
+
+@lru_cache(maxsize=None)
+def _round_map(games):
+    return tuple((config, node) for config in _schedule(games) for node in range(1, config.num_nodes + 1))
+
+
+GAMES = {config.game: config for config in schedule()}
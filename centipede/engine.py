@@ -0,0 +1,552 @@
+import sys
+import time
+from functools import lru_cache
+
+from otree.api import Page, WaitPage
+from otree.database import dbq
+
+from . import monitor
+from .config import round_map, schedule
+
+
+def app_module(obj):
+    """ App module a player, group or subsession belongs to """
+    return sys.modules[type(obj).__module__]
+
+
+def game_round(obj):
+    """ (GameConfig, node) of the round a player, group or subsession belongs to
+
+    The rounds of the app play the session config's games one after another,
+    see centipede.config.round_map; rounds past the last game give (None, None).
+    """
+    rounds = round_map(obj.session.config.get('games'))
+    if obj.round_number > len(rounds):
+        return None, None
+    return rounds[obj.round_number - 1]
+
+
+def game_config(obj):
+    """ GameConfig of the game played in the round of obj, or None past the last game """
+    return game_round(obj)[0]
+
+
+def game_node(obj):
+    """ Node of the game played in the round of obj """
+    return game_round(obj)[1]
+
+
+def num_games(obj):
+    return len(schedule(obj.session.config.get('games')))
+
+
+def playing(player):
+    """ Whether the game of this round is still on; later rounds of an ended game are skipped """
+    return game_config(player) is not None and player.group.game_on and not player.game_over
+
+
+@lru_cache(maxsize=256)
+def node_rows(config, game_node=None):
+    """ One row per node for the payoff tables in the templates, shared between requests """
+    rows = []
+    for node in range(1, config.num_nodes + 1):
+        rows.append(dict(
+            node=node,
+            mover=config.mover(node),
+            action='Take' if node == config.num_nodes else 'Take Payoff or Pass',
+            red_payoff=config.payoff(node, config.role(1)),
+            blue_payoff=config.payoff(node, config.role(2)),
+            current=node == game_node,
+        ))
+    return tuple(rows)
+
+
+@lru_cache(maxsize=256)
+def decision_context(config, node):
+    """ Decision page context, the same for every player at a (game, node) """
+    large_pile, small_pile = config.take_payoffs(node)
+    return dict(
+        game=config.game,
+        num_nodes=config.num_nodes,
+        game_node=node,
+        large_pile=large_pile,
+        small_pile=small_pile,
+        nodes=node_rows(config, node),
+    )
+
+
+@lru_cache(maxsize=256)
+def results_context(config, last_node):
+    """ Results page context shared by every player of a (game, last node) """
+    large_pile, small_pile = config.take_payoffs(last_node)
+    large_pile_pass, small_pile_pass = config.take_payoffs(config.num_nodes + 1)
+    return dict(
+        next_link=None,
+        game=config.game,
+        last_node=last_node,
+        large_pile=large_pile,
+        small_pile=small_pile,
+        large_pile_pass=large_pile_pass,
+        small_pile_pass=small_pile_pass,
+    )
+
+
+def live_mode(player):
+    """ Whether the session plays each game on a single LiveDecision page """
+    return player.session.config.get('live_decisions', False)
+
+
+def matching(obj):
+    """ How pairs are formed: 'fixed', 'arrival' or 'stranger', see ArrivalWaitPage """
+    return obj.session.config.get('matching', 'fixed')
+
+
+def pair_fixed(subsession):
+    """ creating_session part of the 'fixed' mode: pair consecutive participants, as oTree does by default
+
+    An app with a group_by_arrival_time page starts with the whole session in
+    one group, see ArrivalWaitPage; the arrival modes regroup from there.
+    """
+    if matching(subsession) == 'fixed':
+        ids = [p.id_in_subsession for p in subsession.get_players()]
+        subsession.set_group_matrix([ids[i:i + 2] for i in range(0, len(ids), 2)])
+
+
+def pair_arrivals(subsession, waiting_players):
+    """ group_by_arrival_time_method of the app: the next pair among the players waiting on ArrivalWaitPage
+
+    Returns None to keep waiting. 'arrival' pairs the first two players to
+    arrive, and oTree keeps the pair for every later round; 'stranger' pairs
+    players who have not played each other, see stranger_pair. The partners
+    of each participant are kept in participant.vars, along with matched_id,
+    their id in group.
+    """
+    if matching(subsession) == 'stranger':
+        pair = stranger_pair(subsession, waiting_players)
+    else:
+        pair = waiting_players[:2] if len(waiting_players) >= 2 else None
+
+    if pair is None:
+        return None
+    for matched_id, p in enumerate(pair, start=1):
+        other = pair[2 - matched_id]
+        p.participant.vars['matched_id'] = matched_id
+        p.participant.vars['partners'] = p.participant.vars.get('partners', []) + [other.participant.code]
+    return pair
+
+
+LOOKAHEAD_PLAYERS = 12  # largest waiting room checked for a full pairing of new partners
+
+
+def met(p, q):
+    return q.participant.code in p.participant.vars.get('partners', [])
+
+
+def new_pairing(players):
+    """ Whether players can all be paired with partners they have not played """
+    if not players:
+        return True
+    p, rest = players[0], players[1:]
+    return any(not met(p, q) and new_pairing([r for r in rest if r is not q]) for q in rest)
+
+
+def stranger_pair(subsession, waiting_players):
+    """ The 'stranger' pair of the waiting players, or None to wait for more
+
+    Only the players actually waiting are paired, so participants who never
+    show up or drop out hold nobody up. Players who have not played each
+    other are paired first; in small waiting rooms the first such pair that
+    leaves the others a pairing of new partners is taken. When there is no
+    new pair, the two who played each other longest ago are paired once
+    everybody still to be paired in this game is waiting, or once a player has
+    waited the session config stranger_patience seconds (default 60).
+    """
+    pairs = [[p, q] for i, p in enumerate(waiting_players) for q in waiting_players[i + 1:]]
+    new_pairs = [pair for pair in pairs if not met(*pair)]
+    if len(waiting_players) <= LOOKAHEAD_PLAYERS:
+        for pair in new_pairs:
+            rest = [r for r in waiting_players if r not in pair]
+            if len(rest) % 2 or new_pairing(rest):
+                return pair
+    if new_pairs:
+        return new_pairs[0]
+    if not pairs:
+        return None
+
+    game = game_config(subsession).game
+    unpaired = [pp for pp in subsession.session.get_participants() if len(pp.vars.get('partners', [])) < game]
+    patience = subsession.session.config.get('stranger_patience', 60)
+    longest_wait = max(monitor.waited(p, 'ArrivalWaitPage') for p in waiting_players)
+    if len(waiting_players) < len(unpaired) and longest_wait < patience:
+        return None
+
+    def last_met(pair):
+        partners = pair[0].participant.vars['partners']
+        return max(i for i, code in enumerate(partners) if code == pair[1].participant.code)
+
+    return min(pairs, key=last_met)
+
+
+def live_state(group):
+    """ What LiveDecision shows both players at the current node """
+    config = game_config(group)
+    node = group.live_node
+    large_pile, small_pile = config.take_payoffs(node)
+    return dict(
+        node=node,
+        mover=config.mover(node),
+        game_on=group.game_on,
+        can_pass=node < config.num_nodes,
+        large_pile=large_pile,
+        small_pile=small_pile,
+        seconds_left=max(group.live_deadline - time.time(), 0) if group.live_deadline else None,
+    )
+
+
+def start_node(group):
+    """ Start the decision timeout of the mover at the current node of LiveDecision """
+    mover = group.get_player_by_id(game_config(group).mover(group.live_node))
+    timeout = decision_timeout(mover, group.live_node)
+    group.live_deadline = time.time() + timeout if timeout else 0
+
+
+DROPOUT_SECONDS = 5  # timeout of the pages of a participant who dropped out
+
+
+def decision_timeout(player, node):
+    """ Seconds the mover has at node, or None without a timeout
+
+    The session config decision_timeout is either one number for every node
+    or a list with one per node (the last entry covers the remaining nodes);
+    0 turns timeouts off. Participants who dropped out get DROPOUT_SECONDS.
+    """
+    if player.participant.vars.get('dropped_out'):
+        return DROPOUT_SECONDS
+    timeout = player.session.config.get('decision_timeout', 0)
+    if isinstance(timeout, (list, tuple)):
+        timeout = timeout[min(node, len(timeout)) - 1]
+    return timeout or None
+
+
+def timeout_take(player, node):
+    """ The move made for a mover who timed out, by the session config timeout_policy 'pass' or 'take' """
+    config = game_config(player)
+    return node == config.num_nodes or player.session.config.get('timeout_policy', 'pass') == 'take'
+
+
+def note_timeout(player, timeout_happened):
+    """ Track consecutive timeouts of the participant
+
+    After dropout_timeouts of them in a row (session config, default 2) the
+    participant counts as dropped out: their later decisions and results
+    time out after DROPOUT_SECONDS and are played by timeout_policy, so the
+    partner keeps going. A decision submitted in time brings them back.
+    """
+    participant = player.participant
+    if timeout_happened:
+        participant.vars['timeouts'] = participant.vars.get('timeouts', 0) + 1
+        if participant.vars['timeouts'] >= player.session.config.get('dropout_timeouts', 2):
+            participant.vars['dropped_out'] = True
+    else:
+        participant.vars['timeouts'] = 0
+        participant.vars['dropped_out'] = False
+
+
+def live_move(group, player, take, timed_out=False):
+    """ Play the node of LiveDecision that player moves at """
+    config = game_config(group)
+    node = group.live_node
+    take = take or node == config.num_nodes
+    player_in_node = player.in_round(player.round_number + node - 1)
+    player_in_node.take = take
+    player_in_node.timed_out = timed_out
+    if take:
+        group.stop_game(player, node)
+    else:
+        group.live_node = node + 1
+        start_node(group)
+    record_decision(player, take, node, timed_out)
+
+
+def stop_game(group, taker, node=None):
+    """ End the game with a take; the outcome, payoffs and roles are written only here """
+    config = game_config(group)
+    group.game_on = False
+    group.game_outcome = taker.id_in_group
+    group.last_node = node or game_node(taker)
+    # rounds of the game after this one, skipped through Player.game_over
+    last_round = group.round_number - game_node(group) + config.num_nodes
+
+    # assign payoffs, the player who took gets the large pile
+    for p in group.get_players():
+        role = config.role(p.id_in_group)
+        p.payoff_final = config.payoff(group.last_node, role)
+        p.opponent_payoff = config.payoff(group.last_node, 3 - role)
+        p.payoff = p.payoff_final  # oTree adds it to participant.payoff
+        p.first = role == 1
+        if last_round > group.round_number:
+            for later in p.in_rounds(group.round_number + 1, last_round):
+                later.game_over = True
+    monitor.game_ended(group.session.code, config.game)
+
+
+def game_summary(player):
+    """ Conclusion rows of the games played so far, from the rounds in which they ended """
+    rows = []
+    for p in player.in_all_rounds():
+        if p.field_maybe_none('payoff_final') is None:
+            continue
+        config = game_config(p)
+        group = p.group
+        rows.append(dict(
+            game_number=config.game,
+            player_id=config.role(p.id_in_group),
+            round_number=group.last_node,
+            take=group.game_outcome == p.id_in_group,
+            payoff_str=f"${float(p.payoff_final):.2f}",
+            opponent_payoff_str=f"${float(p.opponent_payoff):.2f}",
+        ))
+    return rows
+
+
+def record_decision(player, take, node, timed_out=False):
+    """ Append the take/pass of the mover at this node to the DecisionEvent log of the app """
+    config = game_config(player)
+    partner = player.get_others_in_group()[0]
+    app_module(player).DecisionEvent.create(
+        player=player,
+        group=player.group,
+        session_code=player.session.code,
+        participant_code=player.participant.code,
+        partner_code=partner.participant.code,
+        id_in_subsession=player.group.id_in_subsession,
+        id_in_group=player.id_in_group,
+        game=config.game,
+        node=node,
+        role=config.role(player.id_in_group),
+        take=take,
+        timed_out=timed_out,
+        payoff=player.field_maybe_none('payoff_final'),
+        partner_payoff=partner.field_maybe_none('payoff_final'),
+    )
+    monitor.record_move(player.session.code, config.game, node, take)
+
+
+def vars_for_admin_report(subsession):
+    """ Progress of every game of the session from the in-memory counters, see centipede.monitor """
+    return monitor.report(subsession.session, schedule(subsession.session.config.get('games')))
+
+
+EXPORT_FIELDS = [
+    'session_code', 'id_in_subsession', 'game', 'node', 'id_in_group', 'role', 'take', 'timed_out',
+    'participant_code', 'partner_code', 'payoff', 'partner_payoff',
+]
+
+
+EXPORT_BATCH = 1000  # DecisionEvent rows loaded at a time by export_decisions
+
+
+def export_decisions(event_model):
+    """ Tidy custom_export rows, one per take/pass, streamed from the DecisionEvent table in batches """
+    yield EXPORT_FIELDS
+    for event in dbq(event_model).order_by(event_model.id).yield_per(EXPORT_BATCH):
+        yield [getattr(event, field) for field in EXPORT_FIELDS]
+
+
+def pairing_round(player):
+    """ Whether ArrivalWaitPage pairs the players in this round, see pair_arrivals """
+    mode = matching(player)
+    return mode == 'arrival' and player.round_number == 1 or mode == 'stranger' and game_node(player) == 1
+
+
+def start_game(group):
+    """ after_all_players_arrive of the wait page at node 1, where each group starts a game """
+    monitor.wait_ended(group)
+    monitor.game_started(group, game_config(group).game)
+    if live_mode(group):
+        start_node(group)
+
+
+class WaitPage1(WaitPage):
+    """ Brings the pair together at node 1 of games in which ArrivalWaitPage does not """
+    wait_for_all_groups = False
+
+    @staticmethod
+    def is_displayed(player):
+        return monitor.waiting(player, 'WaitPage1', game_node(player) == 1 and not pairing_round(player))
+
+    @staticmethod
+    def after_all_players_arrive(group):
+        start_game(group)
+
+
+class ArrivalWaitPage(WaitPage):
+    """ Forms the pairs from the players waiting here, by the group_by_arrival_time_method of the app
+
+    With the session config matching='arrival' the first two players to open
+    the session are paired in game 1, and oTree keeps them together in the
+    later games; with matching='stranger' every game pairs waiting players who
+    have not played each other yet, see pair_arrivals. The default 'fixed'
+    skips this page and keeps the pairs made by pair_fixed.
+
+    oTree only groups by arrival time on the first page of page_sequence.
+    """
+    group_by_arrival_time = True
+
+    @staticmethod
+    def is_displayed(player):
+        return monitor.waiting(player, 'ArrivalWaitPage', pairing_round(player))
+
+    @staticmethod
+    def after_all_players_arrive(group):
+        start_game(group)
+
+
+class Decision(Page):
+    template_name = 'centipede/Decision.html'
+    form_model = 'player'
+    form_fields = ['take']
+
+    @staticmethod
+    def is_displayed(player):
+        return (
+            playing(player)
+            and player.id_in_group == game_config(player).mover(game_node(player))
+            and not live_mode(player)
+        )
+
+    @staticmethod
+    def vars_for_template(player):
+        return dict(decision_context(*game_round(player)))
+
+    @staticmethod
+    def get_timeout_seconds(player):
+        return decision_timeout(player, game_node(player))
+
+    @staticmethod
+    def error_message(player, values):
+        # the template only offers Take at the last node, a forged Pass would leave the game unended
+        if not values['take'] and game_node(player) == game_config(player).num_nodes:
+            return "You must take at the last period."
+
+    @staticmethod
+    def before_next_page(player, timeout_happened):
+        note_timeout(player, timeout_happened)
+        if timeout_happened:
+            player.take = timeout_take(player, game_node(player))
+            player.timed_out = True
+        if player.take:
+            player.group.stop_game(player)
+        record_decision(player, player.take, game_node(player), player.timed_out)
+
+
+class LiveDecision(Page):
+    """ The whole game on one page in its first round, with moves pushed over the live channel
+
+    Shown instead of Decision and WaitPage2 when the session config sets
+    live_decisions. The group of the game's first round holds the game state; the take of
+    each node is also stored on the player of that round, like on Decision,
+    so the exports keep their shape.
+    """
+    template_name = 'centipede/LiveDecision.html'
+
+    @staticmethod
+    def is_displayed(player):
+        return game_node(player) == 1 and playing(player) and live_mode(player)
+
+    @staticmethod
+    def vars_for_template(player):
+        config = game_config(player)
+        return dict(
+            game=config.game,
+            num_nodes=config.num_nodes,
+            nodes=node_rows(config),
+        )
+
+    @staticmethod
+    def get_timeout_seconds(player):
+        # each node times out in live_method; the page timeout, the sum over the
+        # nodes, only plays the game out once neither browser calls live_method
+        timeouts = [decision_timeout(player, node) for node in range(1, game_config(player).num_nodes + 1)]
+        return None if None in timeouts else sum(timeouts)
+
+    @staticmethod
+    def live_method(player, data):
+        group = player.group
+        config = game_config(group)
+        mover = group.get_player_by_id(config.mover(group.live_node))
+        if group.game_on and group.live_deadline and time.time() >= group.live_deadline:
+            # the browsers call in once the mover's time is up
+            note_timeout(mover, True)
+            live_move(group, mover, timeout_take(mover, group.live_node), timed_out=True)
+            return {0: live_state(group)}
+        if 'take' in data and group.game_on and player.id_in_group == mover.id_in_group:
+            note_timeout(player, False)
+            live_move(group, player, bool(data['take']))
+            return {0: live_state(group)}
+        return {player.id_in_group: live_state(group)}
+
+    @staticmethod
+    def before_next_page(player, timeout_happened):
+        group = player.group
+        config = game_config(group)
+        if timeout_happened and group.game_on:
+            # only the mover the page timed out on missed a decision
+            note_timeout(group.get_player_by_id(config.mover(group.live_node)), True)
+        # play out the rest of the game by timeout_policy
+        while timeout_happened and group.game_on:
+            mover = group.get_player_by_id(config.mover(group.live_node))
+            live_move(group, mover, timeout_take(mover, group.live_node), timed_out=True)
+
+
+class WaitPage2(WaitPage):
+    wait_for_all_groups = False
+
+    @staticmethod
+    def is_displayed(player):
+        return monitor.waiting(player, 'WaitPage2', playing(player) and not live_mode(player))
+
+    @staticmethod
+    def after_all_players_arrive(group):
+        monitor.wait_ended(group)
+
+
+class Results(Page):
+    template_name = 'centipede/Results.html'
+
+    @staticmethod
+    def is_displayed(player):
+        return not player.group.game_on
+
+    @staticmethod
+    def get_timeout_seconds(player):
+        # with decision timeouts on, a participant who goes idle after their partner took,
+        # and so never sees a Decision page, still moves on to the next game
+        return decision_timeout(player, 1)
+
+    @staticmethod
+    def before_next_page(player, timeout_happened):
+        note_timeout(player, timeout_happened)
+
+    @staticmethod
+    def vars_for_template(player):
+        return dict(
+            results_context(game_config(player), player.group.last_node),
+            player_name=player.participant.vars['identification'],
+            last_game=game_config(player).game == num_games(player),
+        )
+
+
+class WaitPage3(WaitPage):
+    # groups only wait for their own partner; a session-wide barrier would also
+    # wait for groups that already skipped ahead to the next game
+    wait_for_all_groups = False
+
+    @staticmethod
+    def is_displayed(player):
+        last_node = playing(player) and game_node(player) == game_config(player).num_nodes
+        return monitor.waiting(player, 'WaitPage3', last_node)
+
+    @staticmethod
+    def after_all_players_arrive(group):
+        monitor.wait_ended(group)
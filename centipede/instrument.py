@@ -0,0 +1,174 @@
+""" Opt-in timing of page callbacks
+
+Set CENTIPEDE_TIMINGS to a file path before starting the server to wrap the
+callbacks of every page in the page sequences with a timer. Each callback
+gets a latency histogram and a count of the SQL statements it issued, keyed
+by app, page and callback. The file is rewritten at most every
+CENTIPEDE_TIMINGS_INTERVAL seconds (default 10), as JSON if the path ends
+in .json and in the Prometheus text format otherwise.
+"""
+
+import functools
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+
+
+logger = logging.getLogger(__name__)
+
+PATH = os.environ.get('CENTIPEDE_TIMINGS')
+INTERVAL = float(os.environ.get('CENTIPEDE_TIMINGS_INTERVAL', 10))
+
+CALLBACKS = [
+    'is_displayed',
+    'vars_for_template',
+    'js_vars',
+    'before_next_page',
+    'app_after_this_page',
+    'after_all_players_arrive',
+    'live_method',
+    'error_message',
+]
+BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, float('inf')]
+
+
+class Histogram:
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+        self.queries = 0
+
+    def observe(self, seconds, queries):
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                break
+        self.count += 1
+        self.sum += seconds
+        self.queries += queries
+
+
+_lock = threading.Lock()
+_dump_lock = threading.Lock()  # one writer of the file at a time
+_histograms = defaultdict(Histogram)
+_queries = threading.local()
+_last_dump = 0.0
+
+
+def _count_query(*args):
+    _queries.count = getattr(_queries, 'count', 0) + 1
+
+
+def _listen_for_queries():
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    event.listen(Engine, 'before_cursor_execute', _count_query)
+
+
+def timed(func, app, page, callback):
+    key = (app, page, callback)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        queries = getattr(_queries, 'count', 0)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            seconds = time.perf_counter() - start
+            with _lock:
+                _histograms[key].observe(seconds, getattr(_queries, 'count', 0) - queries)
+                due = _dump_due()
+            if due:
+                _dump_quietly()
+
+    return wrapper
+
+
+def instrument(page_sequence):
+    """ Wrap the callbacks of the app's pages in place; a no-op unless CENTIPEDE_TIMINGS is set """
+    if not PATH:
+        return
+    for page in page_sequence:
+        for callback in CALLBACKS:
+            owner = next((k for k in page.__mro__ if callback in k.__dict__), None)
+            # skip oTree's own defaults
+            if owner is None or owner.__module__.startswith('otree'):
+                continue
+            func = inspect.getattr_static(page, callback)
+            if isinstance(func, staticmethod):
+                func = func.__func__
+            if not callable(func):
+                continue
+            setattr(page, callback, staticmethod(timed(func, page.__module__, page.__name__, callback)))
+
+
+def snapshot():
+    with _lock:
+        return {
+            '/'.join(key): dict(
+                count=h.count,
+                sum=h.sum,
+                queries=h.queries,
+                buckets=dict(zip(map(str, BUCKETS), h.buckets)),
+            )
+            for key, h in sorted(_histograms.items())
+        }
+
+
+def prometheus():
+    lines = ['# TYPE centipede_callback_seconds histogram']
+    query_lines = ['# TYPE centipede_callback_queries_total counter']
+    with _lock:
+        for (app, page, callback), h in sorted(_histograms.items()):
+            labels = f'app="{app}",page="{page}",callback="{callback}"'
+            cumulative = 0
+            for bound, count in zip(BUCKETS, h.buckets):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'centipede_callback_seconds_bucket{{{labels},le="{le}"}} {cumulative}')
+            lines.append(f'centipede_callback_seconds_sum{{{labels}}} {h.sum}')
+            lines.append(f'centipede_callback_seconds_count{{{labels}}} {h.count}')
+            query_lines.append(f'centipede_callback_queries_total{{{labels}}} {h.queries}')
+    return '\n'.join(lines + query_lines) + '\n'
+
+
+def dump(path=None):
+    path = path or PATH
+    text = json.dumps(snapshot(), indent=2) if path.endswith('.json') else prometheus()
+    tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp, 'w') as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def _dump_due():
+    """ Whether the file is due for a rewrite; called under _lock, so one request per interval gets True """
+    global _last_dump
+    now = time.monotonic()
+    if now - _last_dump < INTERVAL:
+        return False
+    _last_dump = now
+    return True
+
+
+def _dump_quietly():
+    # the timings are opt-in diagnostics, a failed write must not fail the page request
+    if not _dump_lock.acquire(blocking=False):
+        return
+    try:
+        dump()
+    except Exception:
+        logger.exception('Could not write the callback timings to %s', PATH)
+    finally:
+        _dump_lock.release()
+
+
+if PATH:
+    _listen_for_queries()
@@ -0,0 +1,158 @@
+""" Load driver for a running oTree server
+
+Creates sessions through the oTree REST API and plays every participant of
+them concurrently over plain HTTP, then reports per-page latency percentiles,
+wait-page dwell time and throughput:
+
+    otree devserver  # or prodserver, in another shell
+    python -m centipede.loadtest --sessions 5 --pairs 20
+
+Set OTREE_REST_KEY when the server runs with an auth level. Session configs
+with live_decisions are refused: LiveDecision is played over a websocket,
+which plain HTTP requests cannot drive.
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from os import environ
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+
+import numpy as np
+
+
+PAGE_URL = re.compile(r'/p/[^/]+/([^/]+)/([^/]+)/\d+')
+
+
+class Stats:
+    """ Thread-safe samples of request latency and wait-page dwell time """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latency = defaultdict(list)
+        self.dwell = defaultdict(list)
+        self.finished = 0
+
+    def add(self, samples, page, seconds):
+        with self.lock:
+            samples[page].append(seconds)
+
+    def report(self, wall_time):
+        lines = [f'{"page":<32}{"n":>8}{"p50 ms":>10}{"p90 ms":>10}{"p99 ms":>10}']
+        for title, samples in (('latency', self.latency), ('wait-page dwell', self.dwell)):
+            lines.append(f'-- {title}')
+            for page in sorted(samples):
+                p50, p90, p99 = np.percentile(samples[page], [50, 90, 99]) * 1000
+                lines.append(f'{page:<32}{len(samples[page]):>8}{p50:>10.1f}{p90:>10.1f}{p99:>10.1f}')
+        requests = sum(len(s) for s in self.latency.values())
+        lines.append(f'-- throughput over {wall_time:.1f}s')
+        lines.append(f'{requests / wall_time:.1f} requests/s, {self.finished / wall_time * 3600:.0f} participants/hour')
+        return '\n'.join(lines)
+
+
+def api(server, path, payload=None):
+    headers = {'Content-Type': 'application/json'}
+    if 'OTREE_REST_KEY' in environ:
+        headers['otree-rest-key'] = environ['OTREE_REST_KEY']
+    data = json.dumps(payload).encode() if payload is not None else None
+    with urlopen(Request(f'{server}/api/{path}', data=data, headers=headers)) as resp:
+        return json.loads(resp.read() or 'null')
+
+
+def create_session(server, config_name, pairs):
+    session = api(server, 'sessions', dict(session_config_name=config_name, num_participants=2 * pairs))
+    return [p['code'] for p in api(server, f"sessions/{session['code']}")['participants']]
+
+
+def live_config(config_name):
+    """ Whether the session config of this name plays the games on LiveDecision """
+    from settings import SESSION_CONFIGS
+
+    config = next((c for c in SESSION_CONFIGS if c['name'] == config_name), {})
+    return config.get('live_decisions', False)
+
+
+def form_data(html, rng, take_prob):
+    """ Fields to submit on the current page, or None if it has no next button """
+    if 'name="take"' in html:
+        can_pass = 'value="False"' in html
+        return dict(take=not can_pass or rng.random() < take_prob)
+    if 'name="identification"' in html:
+        return dict(identification=f'Bot {rng.randrange(10 ** 6)}')
+    if 'type="submit"' in html or 'otree-btn-next' in html:
+        return {}
+    return None
+
+
+def play_participant(server, code, stats, take_prob, poll, seed):
+    rng = random.Random(seed)
+    url = f'{server}/InitializeParticipant/{code}'
+    data = None
+    waiting_since = waiting_page = None
+    while True:
+        start = time.perf_counter()
+        with urlopen(Request(url, data=data)) as resp:
+            html = resp.read().decode()
+            url = resp.geturl()
+        stop = time.perf_counter()
+
+        match = PAGE_URL.search(url)
+        if match is None:  # out of pages
+            break
+        page = '/'.join(match.groups())
+        stats.add(stats.latency, page, stop - start)
+        if match.group(2) == 'LiveDecision':
+            raise RuntimeError(f'{page} is a live page, which this driver cannot play')
+
+        if 'WaitPage' in match.group(2):
+            if waiting_since is None:
+                waiting_since, waiting_page = start, page
+            data = None
+            time.sleep(poll)
+            continue
+        if waiting_since is not None:
+            stats.add(stats.dwell, waiting_page, start - waiting_since)
+            waiting_since = None
+
+        fields = form_data(html, rng, take_prob)
+        if fields is None:  # Conclusion
+            break
+        data = urlencode(fields).encode()
+
+    with stats.lock:
+        stats.finished += 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Play concurrent centipede sessions against an oTree server.')
+    parser.add_argument('--server', default='http://localhost:8000')
+    parser.add_argument('--config', default='centipede', help='session config name')
+    parser.add_argument('--sessions', type=int, default=1)
+    parser.add_argument('--pairs', type=int, default=50, help='pairs per session')
+    parser.add_argument('--take-prob', type=float, default=0.3, help='probability that a mover takes')
+    parser.add_argument('--poll', type=float, default=0.5, help='seconds between wait-page refreshes')
+    args = parser.parse_args(argv)
+    if live_config(args.config):
+        parser.error(f'{args.config} plays LiveDecision pages over a websocket, which this driver cannot do')
+
+    codes = [c for _ in range(args.sessions) for c in create_session(args.server, args.config, args.pairs)]
+    stats = Stats()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(codes)) as pool:
+        futures = [
+            pool.submit(play_participant, args.server, code, stats, args.take_prob, args.poll, seed)
+            for seed, code in enumerate(codes)
+        ]
+        for future in futures:
+            future.result()
+    print(stats.report(time.perf_counter() - start))
+
+
+if __name__ == '__main__':
+    main()
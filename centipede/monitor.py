@@ -0,0 +1,123 @@
+""" In-memory session health counters for the admin report
+
+The engine updates the counters of each session as groups start games, moves
+are made and games end, and notes which participants sit on a wait page, so the admin report of
+a running session is built from a few dict lookups instead of a query over
+every Player row. The counters live in the server process: they start empty
+when the server starts, and a session resumed after a restart only shows
+what happened since. Waits longer than CENTIPEDE_STUCK_SECONDS (default 120)
+are reported as stuck.
+"""
+
+import os
+import threading
+import time
+from collections import defaultdict
+
+
+STUCK_SECONDS = float(os.environ.get('CENTIPEDE_STUCK_SECONDS', 120))
+
+
+class SessionCounters:
+    def __init__(self):
+        self.passes = defaultdict(int)  # keyed by (game, node)
+        self.takes = defaultdict(int)
+        self.started = defaultdict(int)  # keyed by game, groups that reached node 1
+        self.ended = defaultdict(int)
+        self.waiting = {}  # (participant code, app, page) -> monotonic start of the wait
+
+
+_lock = threading.Lock()
+_sessions = defaultdict(SessionCounters)
+
+
+def record_move(session_code, game, node, take):
+    with _lock:
+        counters = _sessions[session_code]
+        if take:
+            counters.takes[game, node] += 1
+        else:
+            counters.passes[game, node] += 1
+
+
+def game_started(group, game):
+    """ Count a group that arrived at node 1 of a game, from the after_all_players_arrive of that node """
+    with _lock:
+        _sessions[group.session.code].started[game] += 1
+
+
+def game_ended(session_code, game):
+    with _lock:
+        _sessions[session_code].ended[game] += 1
+
+
+def waiting(player, page, displayed):
+    """ Pass-through for the is_displayed of a wait page that notes when the player starts waiting """
+    if displayed:
+        key = (player.participant.code, type(player).__module__, page)
+        with _lock:
+            _sessions[player.session.code].waiting.setdefault(key, time.monotonic())
+    return displayed
+
+
+def waited(player, page):
+    """ Seconds the player has been waiting on a wait page noted by waiting, 0 if they are not """
+    key = (player.participant.code, type(player).__module__, page)
+    with _lock:
+        since = _sessions[player.session.code].waiting.get(key)
+    return 0 if since is None else time.monotonic() - since
+
+
+def wait_ended(group):
+    """ Forget the waits of a group released from a wait page """
+    codes = {p.participant.code for p in group.get_players()}
+    with _lock:
+        waiting = _sessions[group.session.code].waiting
+        for key in [key for key in waiting if key[0] in codes]:
+            del waiting[key]
+
+
+def report(session, configs):
+    """ Admin report context: groups at each node of every game and the session's current waits """
+    pairs = session.num_participants // 2
+    now = time.monotonic()
+    with _lock:
+        counters = _sessions[session.code]
+        games = []
+        for config in configs:
+            rows = []
+            reached = counters.started[config.game]
+            for node in range(1, config.num_nodes + 1):
+                takes = counters.takes[config.game, node]
+                passes = counters.passes[config.game, node]
+                rows.append(dict(
+                    node=node,
+                    mover=config.mover(node),
+                    at_node=max(reached - takes - passes, 0),
+                    passes=passes,
+                    takes=takes,
+                    take_rate=f'{takes / (takes + passes):.0%}' if takes + passes else '',
+                ))
+                reached = passes
+            games.append(dict(
+                game=config.game,
+                ended=counters.ended[config.game],
+                in_progress=sum(row['at_node'] for row in rows),
+                nodes=rows,
+            ))
+        waits = sorted(
+            (
+                dict(participant=code, app=app, page=page, seconds=round(now - since))
+                for (code, app, page), since in counters.waiting.items()
+            ),
+            key=lambda w: -w['seconds'],
+        )
+    stuck = [w for w in waits if w['seconds'] >= STUCK_SECONDS]
+    return dict(
+        pairs=pairs,
+        games=games,
+        waiting=len(waits),
+        stuck=stuck,
+        num_stuck=len(stuck),
+        stuck_seconds=int(STUCK_SECONDS),
+    )
@@ -0,0 +1,24 @@
+from functools import lru_cache
+
+import numpy as np
+
+
+@lru_cache(maxsize=None)
+def payoff_table(large_pile, small_pile, base, num_nodes):
+    """ Read-only (num_nodes + 1, 2) array of payoffs keyed by node and role
+
+    Row node - 1 holds the payoffs of the first and second mover when the game
+    ends with a take at that node; the extra last row is the outcome when
+    every node is passed. The mover of odd nodes (role 1) gets the large pile
+    there and the second mover gets it on even nodes.
+    """
+    growth = np.asarray(base) ** np.arange(num_nodes + 1)
+    large = large_pile * growth
+    small = small_pile * growth
+    first_takes = np.arange(num_nodes + 1) % 2 == 0
+    table = np.column_stack((
+        np.where(first_takes, large, small),
+        np.where(first_takes, small, large),
+    ))
+    table.setflags(write=False)
+    return table
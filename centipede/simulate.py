@@ -0,0 +1,77 @@
+""" Monte Carlo simulation of centipede games outside of oTree
+
+Movers take at each node with a given probability; a game ends at the first
+take, or after the last node when nobody takes. The apps only offer Take at
+the last node, which corresponds to a take probability of 1 there.
+
+    python -m centipede.simulate --take-probs 0.1 0.2 0.3 0.4 0.5 1 --pairs 10
+"""
+
+import argparse
+
+import numpy as np
+
+from .config import session_schedule
+
+
+def end_node_probabilities(config, take_probs):
+    """ Probability that the game ends at node 1..num_nodes, or num_nodes + 1 if all pass """
+    take_probs = np.asarray(take_probs, dtype=float)
+    if take_probs.shape != (config.num_nodes,):
+        raise ValueError(f'Expected {config.num_nodes} take probabilities, got {take_probs.shape}')
+    reached = np.concatenate(([1.0], np.cumprod(1 - take_probs)))
+    return reached * np.append(take_probs, 1.0)
+
+
+def player_payoffs(config):
+    """ Payoff table keyed by node and id_in_group instead of role """
+    return config.payoffs[:, [config.role(1) - 1, config.role(2) - 1]]
+
+
+def simulate_games(config, take_probs, num_games, rng=None):
+    """ Play num_games games; returns the end nodes and the (num_games, 2) payoffs by id_in_group """
+    rng = np.random.default_rng(rng)
+    probabilities = end_node_probabilities(config, take_probs)
+    end_nodes = rng.choice(config.num_nodes + 1, size=num_games, p=probabilities) + 1
+    return end_nodes, player_payoffs(config)[end_nodes - 1]
+
+
+def expected_session_cost(configs, take_probs, num_pairs):
+    """ Expected points paid out to all participants of a session playing configs in order """
+    return num_pairs * sum(
+        end_node_probabilities(config, take_probs) @ config.payoffs.sum(axis=1) for config in configs
+    )
+
+
+def simulate_session_costs(configs, take_probs, num_pairs, num_sessions, rng=None):
+    """ Points paid out to all participants in each of num_sessions simulated sessions """
+    rng = np.random.default_rng(rng)
+    costs = np.zeros(num_sessions)
+    for config in configs:
+        probabilities = end_node_probabilities(config, take_probs)
+        end_nodes = rng.choice(config.num_nodes + 1, size=(num_sessions, num_pairs), p=probabilities)
+        costs += config.payoffs.sum(axis=1)[end_nodes].sum(axis=1)
+    return costs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Simulate the payouts of centipede sessions.')
+    parser.add_argument('--take-probs', type=float, nargs='+', required=True, help='take probability per node')
+    parser.add_argument('--pairs', type=int, default=10, help='pairs per session')
+    parser.add_argument('--sessions', type=int, default=100_000, help='simulated sessions')
+    parser.add_argument('--currency-per-point', type=float, default=1.0)
+    parser.add_argument('--config', default='centipede', help='session config whose games to play')
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args(argv)
+
+    configs = session_schedule(args.config)
+    costs = simulate_session_costs(configs, args.take_probs, args.pairs, args.sessions, args.seed)
+    costs *= args.currency_per_point
+    expected = expected_session_cost(configs, args.take_probs, args.pairs) * args.currency_per_point
+    p5, p50, p95 = np.percentile(costs, [5, 50, 95])
+    print(f'expected cost per session: {expected:.2f}')
+    print(f'simulated: mean {costs.mean():.2f}, p5 {p5:.2f}, median {p50:.2f}, p95 {p95:.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+""" Subgame-perfect and logit quantal response equilibria of the centipede game
+
+Both come from backward induction on the payoff table: the mover of each node
+compares the take payoff with the (expected) payoff of passing. The agent
+logit QRE of a perfect-information game is unique, so no fixed-point
+iteration is needed. Solutions are vectorized over the logit precision and
+over parameter sets with the same number of nodes, and kept in an on-disk
+cache keyed by the parameters.
+"""
+
+import hashlib
+import os
+
+import numpy as np
+
+from .payoffs import payoff_table
+
+
+CACHE_DIR = os.environ.get('CENTIPEDE_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'centipede'))
+
+
+def _logit(x):
+    return np.exp(-np.logaddexp(0, -x))
+
+
+def backward_induction(payoffs, take_prob):
+    """ Take probability per node and expected payoffs by role at the root
+
+    payoffs has shape (..., num_nodes + 1, 2) and take_prob maps the mover's
+    gain from taking over passing to a take probability; its output may
+    broadcast to extra leading dimensions (e.g. one per logit precision).
+    The apps only offer Take at the last node, so its probability is 1 and
+    the pass-all row of payoffs is never reached.
+    """
+    payoffs = np.asarray(payoffs, dtype=float)
+    num_nodes = payoffs.shape[-2] - 1
+    value = payoffs[..., num_nodes - 1, :]
+    probs = [np.ones_like(take_prob(np.zeros_like(value[..., 0])))]
+    for node in range(num_nodes - 1, 0, -1):
+        role = (node - 1) % 2
+        take = payoffs[..., node - 1, :]
+        p = take_prob(take[..., role] - value[..., role])
+        value = p[..., None] * take + (1 - p[..., None]) * value
+        probs.append(p)
+    return np.stack(probs[::-1], axis=-1), value
+
+
+def subgame_perfect(payoffs):
+    """ 1 where the mover takes in the subgame-perfect equilibrium, 0 where they pass """
+    return backward_induction(payoffs, lambda gain: (gain > 0).astype(float))
+
+
+def logit_qre(payoffs, precisions):
+    """ Agent logit QRE for each precision; take probabilities have shape (..., len(precisions), num_nodes) """
+    precisions = np.asarray(precisions, dtype=float)
+    payoffs = np.asarray(payoffs, dtype=float)[..., None, :, :]
+    return backward_induction(payoffs, lambda gain: _logit(precisions * gain))
+
+
+CACHE_VERSION = 2  # bumped when the solutions change, so older cache files are not read
+
+
+def _cache_path(params, precisions):
+    key = repr((CACHE_VERSION, tuple(params), np.asarray(precisions, dtype=float).tolist())).encode()
+    return os.path.join(CACHE_DIR, f'{hashlib.sha1(key).hexdigest()}.npz')
+
+
+def solve_grid(param_sets, precisions):
+    """ Solve every (large_pile, small_pile, base, num_nodes) in param_sets
+
+    Returns a dict keyed by parameter set with the SPE take decisions and
+    outcome plus the QRE take probabilities and expected payoffs per
+    precision. Parameter sets already solved for these precisions are read
+    from the cache; the others are solved together, one vectorized call per
+    number of nodes.
+    """
+    solutions = {}
+    missing = {}
+    for params in map(tuple, param_sets):
+        path = _cache_path(params, precisions)
+        if os.path.exists(path):
+            with np.load(path) as cached:
+                solutions[params] = dict(cached)
+        else:
+            missing.setdefault(params[3], []).append(params)
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    for group in missing.values():
+        tables = np.stack([payoff_table(*params) for params in group])
+        spe_take, spe_payoffs = subgame_perfect(tables)
+        qre_take, qre_payoffs = logit_qre(tables, precisions)
+        for i, params in enumerate(group):
+            solution = dict(
+                precisions=np.asarray(precisions, dtype=float),
+                spe_take=spe_take[i],
+                spe_payoffs=spe_payoffs[i],
+                qre_take=qre_take[i],
+                qre_payoffs=qre_payoffs[i],
+            )
+            np.savez(_cache_path(params, precisions), **solution)
+            solutions[params] = solution
+    return solutions
+
+
+def solve(config, precisions):
+    """ Solution of the parameters of one GameConfig, see solve_grid """
+    params = (config.large_pile, config.small_pile, config.base, config.num_nodes)
+    return solve_grid([params], precisions)[params]
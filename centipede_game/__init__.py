@@ -0,0 +1,163 @@
+from otree.api import *
+
+from centipede import engine, instrument
+from centipede.config import max_rounds, round_map
+from settings import SESSION_CONFIGS
+
+
+doc = """ oTree App for the Centipede Games
+
+The games list of the session config sets the games played in a session, see
+centipede.config.schedule; each game takes one round per node.
+"""
+
+
+class Constants(BaseConstants):
+    name_in_url = 'centipede'
+    players_per_group = 2
+    # enough rounds for the longest games list of SESSION_CONFIGS, sessions with fewer games skip the rest
+    num_rounds = max_rounds(SESSION_CONFIGS)
+
+
+class Subsession(BaseSubsession):
+    game = models.IntegerField()  # game and node of this round, for the exports
+    node = models.IntegerField()
+
+
+def creating_session(subsession):
+    rounds = len(round_map(subsession.session.config.get('games')))
+    if rounds > Constants.num_rounds:
+        raise ValueError(
+            f"The games of this session need {rounds} rounds but the app has {Constants.num_rounds}; "
+            "add a session config with these games to SESSION_CONFIGS"
+        )
+    subsession.game = getattr(engine.game_config(subsession), 'game', None)
+    subsession.node = engine.game_node(subsession)
+    engine.pair_fixed(subsession)
+
+
+def group_by_arrival_time_method(subsession, waiting_players):
+    return engine.pair_arrivals(subsession, waiting_players)
+
+
+class Group(BaseGroup):
+    game_on = models.BooleanField(initial=True)
+    game_outcome = models.IntegerField(initial=0)
+    last_node = models.IntegerField(initial=1)
+    live_node = models.IntegerField(initial=1)  # node being played on LiveDecision
+    live_deadline = models.FloatField(initial=0)  # time.time() the mover at live_node times out at, 0 for never
+
+    stop_game = engine.stop_game
+
+
+class Player(BasePlayer):
+    identification = models.StringField(blank=True)
+    first = models.BooleanField()  # written once, when the game ends
+    take = models.BooleanField(label='', widget=widgets.RadioSelectHorizontal)
+    timed_out = models.BooleanField(initial=False)  # take was set by the timeout policy
+    payoff_final = models.CurrencyField()  # written in the round the game ended in, with opponent_payoff
+    opponent_payoff = models.CurrencyField()
+    game_over = models.BooleanField(initial=False)  # the game of this round ended in an earlier round
+
+
+class DecisionEvent(ExtraModel):
+    """ One row per take/pass, see engine.record_decision """
+    player = models.Link(Player)
+    group = models.Link(Group)
+    session_code = models.StringField()
+    participant_code = models.StringField()
+    partner_code = models.StringField()
+    id_in_subsession = models.IntegerField()
+    id_in_group = models.IntegerField()
+    game = models.IntegerField()
+    node = models.IntegerField()
+    role = models.IntegerField()
+    take = models.BooleanField()
+    timed_out = models.BooleanField()
+    payoff = models.CurrencyField()
+    partner_payoff = models.CurrencyField()
+
+
+class Welcome(Page):
+    form_model = 'player'
+    form_fields = ['identification']
+    def is_displayed(player):
+        return player.round_number == 1
+
+    def error_message(player, values):
+        """Custom validation error"""
+        if not values['identification'].strip():  # empty or only spaces
+            return "You must enter your name."
+
+
+class Instructions(Page):
+    def is_displayed(player):
+        return player.round_number == 1
+
+    def vars_for_template(player):
+        config = engine.game_config(player)
+        return dict(
+            nodes=engine.node_rows(config),
+            num_nodes=config.num_nodes,
+            num_games=engine.num_games(player),
+        )
+
+    def before_next_page(player, timeout_happened):
+        player.participant.vars['identification'] = player.identification
+        player.participant.label = player.identification
+
+
+def custom_export(players):
+    yield from engine.export_decisions(DecisionEvent)
+
+
+def vars_for_admin_report(subsession):
+    return engine.vars_for_admin_report(subsession)
+
+
+class ArrivalWaitPage(engine.ArrivalWaitPage):
+    pass
+
+
+class WaitPage1(engine.WaitPage1):
+    pass
+
+
+class Decision(engine.Decision):
+    pass
+
+
+class LiveDecision(engine.LiveDecision):
+    pass
+
+
+class WaitPage2(engine.WaitPage2):
+    pass
+
+
+class Results(engine.Results):
+    pass
+
+
+class WaitPage3(engine.WaitPage3):
+    pass
+
+
+class Conclusion(Page):
+    def is_displayed(player):
+        return not player.group.game_on and engine.game_config(player).game == engine.num_games(player)
+
+    def vars_for_template(player):
+        # the payoffs are stored as each game ends, see engine.stop_game
+        participant = player.participant
+        return dict(
+            game_data=engine.game_summary(player),
+            total_payoff=f"${float(participant.payoff):.2f}",
+            player_name = participant.vars['identification'],
+        )
+
+
+page_sequence = [
+    ArrivalWaitPage, Welcome, Instructions, WaitPage1, Decision, LiveDecision, WaitPage2, Results, WaitPage3, Conclusion,
+]
+instrument.instrument(page_sequence)
@@ -0,0 +1,8 @@
+from centipede import bots
+from centipede.bots import call_live_method
+from centipede.config import schedule
+from settings import SESSION_CONFIGS
+
+
+class PlayerBot(bots.PlayerBot):
+    cases = list(range(1, max(c.num_nodes for s in SESSION_CONFIGS for c in schedule(s.get('games'))) + 1))
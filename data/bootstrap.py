@@ -0,0 +1,125 @@
+"""Cluster-bootstrap confidence intervals for take rates and payoffs.
+
+Groups (group.id_in_subsession within a session) are resampled with
+replacement. Each chunk of replicates is drawn as one NumPy index matrix,
+turned into cluster weights, and multiplied into per-cluster totals, so all
+replicates of a chunk are evaluated at once; the chunk size bounds memory.
+
+Usage:
+    python bootstrap.py clean.parquet -b 10000 -o take_rates.csv
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from centipede.config import GAMES, session_schedule  # noqa: E402
+from data_clean import read  # noqa: E402
+
+
+def cluster_totals(df_clean, games=GAMES):
+    """Per-cluster takes, passes and payoffs.
+
+    Returns the cluster totals as a (clusters, columns) array and the
+    statistic keys of its columns: ("take", r, node) and ("pass", r, node)
+    count the decisions at each node of game r, once per game from the
+    taker's row, and ("payoff", r) / ("participants", r) sum payoff_final
+    over the cluster's participants.
+    """
+    clusters, _ = pd.factorize(pd.MultiIndex.from_frame(df_clean[["session", "group.id_in_subsession"]]))
+    num_clusters = clusters.max() + 1
+    blocks, keys = [], []
+    for r, config in games.items():
+        n = config.num_nodes
+        taken = df_clean[f"game_{r}.take"].to_numpy(dtype=float) == 1
+        end_nodes = df_clean[f"game_{r}.round_taken"].to_numpy(dtype=float)[taken].astype(int)
+        takes = np.zeros((num_clusters, n))
+        np.add.at(takes, (clusters[taken], end_nodes - 1), 1)
+        # a game ending at node k is passed at every node before k
+        passes = takes[:, ::-1].cumsum(axis=1)[:, ::-1] - takes
+        payoff = df_clean[f"game_{r}.payoff_final"].to_numpy(dtype=float)
+        present = ~np.isnan(payoff)
+        blocks += [
+            takes,
+            passes,
+            np.bincount(clusters[present], payoff[present], minlength=num_clusters)[:, None],
+            np.bincount(clusters[present], minlength=num_clusters)[:, None].astype(float),
+        ]
+        keys += [("take", r, node) for node in range(1, n + 1)]
+        keys += [("pass", r, node) for node in range(1, n + 1)]
+        keys += [("payoff", r), ("participants", r)]
+    return np.hstack(blocks), keys
+
+
+def statistics(totals, keys):
+    """Take rate per game and node and mean payoff per game from summed totals (..., columns)."""
+    column = {key: i for i, key in enumerate(keys)}
+    names, values = [], []
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for key in keys:
+            if key[0] == "take":
+                takes = totals[..., column[key]]
+                passes = totals[..., column[("pass",) + key[1:]]]
+                names.append(("take_rate",) + key[1:])
+                values.append(takes / (takes + passes))
+            elif key[0] == "payoff":
+                names.append(("mean_payoff", key[1], np.nan))
+                values.append(totals[..., column[key]] / totals[..., column[("participants", key[1])]])
+    return names, np.stack(values, axis=-1)
+
+
+def replicate_weights(rng, replicates, num_clusters):
+    """How often each cluster is drawn in each replicate, from a (replicates, clusters) index matrix."""
+    index = rng.integers(num_clusters, size=(replicates, num_clusters))
+    offsets = np.arange(replicates)[:, None] * num_clusters
+    return np.bincount((index + offsets).ravel(), minlength=replicates * num_clusters).reshape(
+        replicates, num_clusters
+    )
+
+
+def bootstrap(df_clean, replicates=10_000, chunk=1_000, alpha=0.05, seed=None, games=GAMES):
+    """Point estimates and percentile confidence intervals of the take rates and mean payoffs."""
+    totals, keys = cluster_totals(df_clean, games)
+    names, estimate = statistics(totals.sum(axis=0), keys)
+
+    rng = np.random.default_rng(seed)
+    draws = np.empty((replicates, len(names)))
+    for start in range(0, replicates, chunk):
+        size = min(chunk, replicates - start)
+        weights = replicate_weights(rng, size, len(totals))
+        draws[start:start + size] = statistics(weights @ totals, keys)[1]
+
+    lo, hi = np.nanpercentile(draws, [100 * alpha / 2, 100 * (1 - alpha / 2)], axis=0)
+    result = pd.DataFrame(names, columns=["statistic", "game", "node"])
+    result["estimate"] = estimate
+    result["se"] = np.nanstd(draws, axis=0, ddof=1)
+    result["ci_low"] = lo
+    result["ci_high"] = hi
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cluster-bootstrap take rates and payoffs of cleaned centipede data.")
+    parser.add_argument("input", help="output of data_clean.py")
+    parser.add_argument("-o", "--output", help="CSV file for the results (default: print them)")
+    parser.add_argument("-b", "--replicates", type=int, default=10_000)
+    parser.add_argument("-c", "--chunk", type=int, default=1_000, help="replicates evaluated at once")
+    parser.add_argument("-a", "--alpha", type=float, default=0.05, help="1 - confidence level")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--config", default="centipede", help="session config whose games were played")
+    args = parser.parse_args(argv)
+
+    games = {config.game: config for config in session_schedule(args.config)}
+    result = bootstrap(read(args.input), args.replicates, args.chunk, args.alpha, args.seed, games)
+    if args.output:
+        result.to_csv(args.output, index=False)
+        print(f"Saved {args.replicates} bootstrap replicates to {args.output}")
+    else:
+        print(result.to_string(index=False))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,13 +1,20 @@
-import pandas as pd
-from openpyxl.utils import get_column_letter
+"""Clean wide oTree exports of the centipede games into one row per participant.
 
-raw_csv = "/Users/zachklopping/Desktop/Centipede.csv"     # your oTree raw data
-output_xlsx = "clean.xlsx"   # output Excel file
+Usage:
+    python data_clean.py Centipede.csv [more.csv ...] -o clean.parquet
+    python data_clean.py exports/ "old/*.csv" -o clean.parquet --jobs 8
+"""
+import argparse
+import glob
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
 
-# Load CSV
-df = pd.read_csv(raw_csv)
+import numpy as np
+import pandas as pd
 
-df = df[df["participant._current_page_name"] == "Conclusion"]
+chunksize = 10_000           # rows per chunk read from the CSV
 
 # participant columns to keep explicitly (Unchanged)
 participant_cols = [
@@ -16,64 +23,212 @@ participant_cols = [
     "participant.label",
     "participant._current_page_name",
     "participant.payoff",
-    "centipede_game_1.2.group.id_in_subsession"
 ]
+# group of the first game, in exports of the centipede_game app and of the
+# older layout with one app per game (centipede_game_1..4)
+group_cols = [
+    "centipede_game.1.group.id_in_subsession",
+    "centipede_game_1.2.group.id_in_subsession",
+]
+
+player_fields = ["payoff_final", "first", "take"]
+player_column = re.compile(rf"^centipede_game(?:_(\d+))?\.(\d+)\.player\.({'|'.join(player_fields)})$")
+
+
+def game_columns(header):
+    """Map each field to its per-round player columns in the header, in round order.
+
+    Also returns where the game and node of each round come from: the
+    subsession.game and subsession.node columns of the centipede_game app,
+    or, in the one-app-per-game layout, the fixed (app number, round). The
+    header is parsed once per export instead of once per row.
+    """
+    rounds = {}
+    for c in header:
+        match = player_column.match(c)
+        if match is not None:
+            app, node, field = match.groups()
+            rounds.setdefault((int(app or 0), int(node)), {})[field] = c
+
+    columns = {field: [] for field in player_fields}
+    sources = {"game": [], "node": []}
+    for (app, node), fields in sorted(rounds.items()):
+        if len(fields) < len(player_fields):
+            continue
+        for field in player_fields:
+            columns[field].append(fields[field])
+        if app:
+            sources["game"].append(app)
+            sources["node"].append(node)
+        else:
+            sources["game"].append(f"centipede_game.{node}.subsession.game")
+            sources["node"].append(f"centipede_game.{node}.subsession.node")
+    return columns, sources
+
+
+def round_values(df, sources):
+    """(rows, rounds) array of the game or node of each round, from a column or a fixed number."""
+    values = [
+        pd.to_numeric(df[source], errors="coerce").to_numpy(dtype=float) if isinstance(source, str)
+        else np.full(len(df), float(source))
+        for source in sources
+    ]
+    return np.column_stack(values) if values else np.empty((len(df), 0))
+
+
+def clean_chunk(df, columns, sources):
+    """Coalesce one chunk of the wide export into one row per participant."""
+    # Start the clean dataframe with just the participant data
+    df_clean = df.loc[:, participant_cols + ["group.id_in_subsession"]].copy()
+    rows = np.arange(len(df))
+
+    game = round_values(df, sources["game"])
+    node = round_values(df, sources["node"])
+    payoff = df[columns["payoff_final"]].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)
+    first = df[columns["first"]].to_numpy(dtype=object)
+    take = df[columns["take"]].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)
+
+    for r in np.unique(game[~np.isnan(game)]).astype(int):
+        in_game = game == r
+
+        # 1. COALESCE PAYOFFS (Numeric): sum them horizontally, ignoring NaN
+        df_clean[f"game_{r}.payoff_final"] = np.nansum(np.where(in_game, payoff, np.nan), axis=1)
+
+        # 2. COALESCE PLAYER.FIRST (Non-Numeric): first non-empty value of the game's rounds
+        present = in_game & ~pd.isna(first)
+        first_data = first[rows, present.argmax(axis=1)]
+        df_clean[f"game_{r}.player_first"] = np.where(present.any(axis=1), first_data, np.nan)
+
+        # 3. COALESCE PLAYER.TAKE and FIND ROUND (Numeric)
+        game_take = np.where(in_game, take, np.nan)
+
+        # A) The simple 'take' column (0 or 1): a row like [NaN, 0, 1, 0] becomes 1
+        df_clean[f"game_{r}.take"] = np.nansum(game_take, axis=1)
+
+        # B) The round number they took in: node of the first round holding a 1
+        taken = game_take == 1
+        df_clean[f"game_{r}.round_taken"] = np.where(
+            taken.any(axis=1), node[rows, taken.argmax(axis=1)], np.nan
+        )
+
+    return df_clean
+
+
+def clean_csv(path):
+    """Read only the needed columns of an oTree export in chunks and clean them."""
+    header = pd.read_csv(path, nrows=0).columns
+    columns, sources = game_columns(header)
+    group_col = next(c for c in group_cols if c in header)
+    usecols = participant_cols + [group_col] + [c for cols in columns.values() for c in cols]
+    usecols += [s for s in sources["game"] + sources["node"] if isinstance(s, str)]
+    has_session = "session.code" in header
+    if has_session:
+        usecols.append("session.code")
+
+    chunks = []
+    for chunk in pd.read_csv(path, usecols=usecols, chunksize=chunksize, low_memory=False):
+        chunk = chunk[chunk["participant._current_page_name"] == "Conclusion"]
+        if not chunk.empty:
+            chunk = chunk.rename(columns={group_col: "group.id_in_subsession"})
+            df_clean = clean_chunk(chunk, columns, sources)
+            # exports without session columns are one session per file
+            session = chunk["session.code"] if has_session else os.path.splitext(os.path.basename(path))[0]
+            df_clean.insert(0, "session", session)
+            chunks.append(df_clean)
+
+    if not chunks:
+        empty = pd.DataFrame(columns=usecols).rename(columns={group_col: "group.id_in_subsession"})
+        df_clean = clean_chunk(empty, columns, sources)
+        df_clean.insert(0, "session", pd.Series(dtype=object))
+        return df_clean
+    return pd.concat(chunks, ignore_index=True)
+
+
+def expand_inputs(inputs):
+    """Expand directories and glob patterns into a sorted list of CSV paths."""
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            paths.extend(sorted(glob.glob(os.path.join(item, "*.csv"))))
+        elif glob.has_magic(item):
+            paths.extend(sorted(glob.glob(item)))
+        else:
+            paths.append(item)
+    return paths
+
+
+def clean(paths, jobs=None):
+    """Clean one or more oTree exports into a single dataframe.
+
+    Each export is cleaned in its own worker process when there are several;
+    jobs defaults to the number of CPUs.
+    """
+    paths = expand_inputs(paths)
+    if len(paths) > 1 and jobs != 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            frames = list(pool.map(clean_csv, paths))
+    else:
+        frames = [clean_csv(path) for path in paths]
+    return pd.concat(frames, ignore_index=True)
+
+
+def write_excel(df_clean, output):
+    """Save to Excel with adjusted column widths."""
+    from openpyxl.utils import get_column_letter
+
+    with pd.ExcelWriter(output, engine="openpyxl") as writer:
+        df_clean.to_excel(writer, index=False, sheet_name="CleanedData")
+        worksheet = writer.sheets["CleanedData"]
+
+        # Auto-adjust column widths based on content
+        for i, column in enumerate(df_clean.columns, start=1):
+            col_letter = get_column_letter(i)
+            # Calculate width based on column name length plus some padding
+            column_width = max(len(str(column)) + 2, 10)  # minimum width of 10
+            worksheet.column_dimensions[col_letter].width = column_width
+
+
+writers = {
+    "xlsx": write_excel,
+    "parquet": lambda df, output: df.to_parquet(output, index=False),
+    "feather": lambda df, output: df.to_feather(output),
+    "csv": lambda df, output: df.to_csv(output, index=False),
+}
+
+
+readers = {
+    "xlsx": pd.read_excel,
+    "parquet": pd.read_parquet,
+    "feather": pd.read_feather,
+    "csv": pd.read_csv,
+}
+
+
+def read(path):
+    """Read cleaned data back from any of the output formats."""
+    return readers[path.rsplit(".", 1)[-1].lower()](path)
+
+
+def write(df_clean, output, fmt=None):
+    """Write the cleaned data; the format defaults to the output's extension."""
+    fmt = fmt or output.rsplit(".", 1)[-1].lower()
+    if fmt not in writers:
+        raise ValueError(f"Unknown output format {fmt!r}, expected one of {', '.join(writers)}")
+    writers[fmt](df_clean, output)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Clean oTree exports of the centipede games.")
+    parser.add_argument("inputs", nargs="+", help="oTree CSV exports (all apps), directories or glob patterns")
+    parser.add_argument("-o", "--output", default="clean.xlsx", help="output file (default: clean.xlsx)")
+    parser.add_argument("-f", "--format", choices=sorted(writers), help="output format (default: from extension)")
+    parser.add_argument("-j", "--jobs", type=int, help="worker processes (default: number of CPUs)")
+    args = parser.parse_args(argv)
+
+    df_clean = clean(args.inputs, args.jobs)
+    write(df_clean, args.output, args.format)
+    print(f"Successfully cleaned data and saved to {args.output}")
+
 
-# Start the clean dataframe with just the participant data
-df_clean = df.loc[:, participant_cols].copy()
-
-# --- START: New "Per-Row" Merging Logic ---
-for r in range(1, 5):  # For games 1–4
-    
-    # 1. COALESCE PAYOFFS (Numeric)
-    payoff_cols = df.filter(regex=f"^centipede_game_{r}\..*\.player\.payoff_final$").columns
-    if not payoff_cols.empty:
-        # Sum them horizontally (axis=1)
-        payoff_data = df[payoff_cols].apply(pd.to_numeric, errors='coerce').sum(axis=1)
-        df_clean[f'game_{r}.payoff_final'] = payoff_data
-
-    # 2. COALESCE PLAYER.FIRST (Non-Numeric)
-    first_cols = df.filter(regex=f"^centipede_game_{r}\..*\.player\.first$").columns
-    if not first_cols.empty:
-        # bfill() fills NaN with the next value in the row
-        first_data = df[first_cols].fillna(method='bfill', axis=1).iloc[:, 0]
-        df_clean[f'game_{r}.player_first'] = first_data
-
-    # 3. COALESCE PLAYER.TAKE and FIND ROUND (Numeric)
-    take_cols = df.filter(regex=f"^centipede_game_{r}\..*\.player\.take$").columns
-    if not take_cols.empty:
-        # Convert all to numeric (NaNs for errors)
-        take_df = df[take_cols].apply(pd.to_numeric, errors='coerce')
-        
-        # A) Create the simple 'take' column (0 or 1)
-        # We can sum() them just like payoffs. A row like [NaN, 0, 1, 0] becomes 1.
-        df_clean[f'game_{r}.take'] = take_df.sum(axis=1)
-        
-        # B) Find the round number they took in
-        # .idxmax(axis=1) finds the column *name* (label) with the max value (which is 1)
-        # We replace 0 with NaN so idxmax() ignores 'pass' (0) rounds
-        take_col_names = take_df.replace(0, pd.NA).idxmax(axis=1)
-        
-        # Extract the round number (1-6) from the column name
-        df_clean[f'game_{r}.round_taken'] = take_col_names.str.extract(r"\.([1-6])\.")[0].astype(float)
-
-# --- END: New "Per-Row" Merging Logic ---
-
-# Rename the group ID as you had before (Unchanged)
-df_clean = df_clean.rename(columns={
-    "centipede_game_1.2.group.id_in_subsession": "group.id_in_subsession"
-})
-
-# Save to Excel with adjusted column widths
-with pd.ExcelWriter(output_xlsx, engine="openpyxl") as writer:
-    df_clean.to_excel(writer, index=False, sheet_name="CleanedData")
-    worksheet = writer.sheets["CleanedData"]
-
-    # Auto-adjust column widths based on content
-    for i, column in enumerate(df_clean.columns, start=1):
-        col_letter = get_column_letter(i)
-        # Calculate width based on column name length plus some padding
-        column_width = max(len(str(column)) + 2, 10)  # minimum width of 10
-        worksheet.column_dimensions[col_letter].width = column_width
-        
-print(f"Successfully cleaned data and saved to {output_xlsx}")
\ No newline at end of file
+if __name__ == "__main__":
+    sys.exit(main())
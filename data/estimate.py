@@ -0,0 +1,193 @@
+"""Fit logit-QRE and level-k models to cleaned centipede data.
+
+Consumes the output of data_clean.py, reduces it to take/pass counts per
+game, node and role, and maximizes vectorized likelihoods with analytic
+gradients. Several random starts are spread over a process pool.
+
+Usage:
+    python estimate.py clean.parquet --model qre
+    python estimate.py clean.parquet --model levelk --levels 3 --starts 32
+"""
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy.optimize import minimize
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from centipede.config import GAMES, session_schedule  # noqa: E402
+from data_clean import read  # noqa: E402
+
+
+def sufficient_statistics(df_clean, games=GAMES):
+    """Take and pass counts per game and node as a (games, nodes, 2) array.
+
+    Every game is counted once, from the row of the participant who took:
+    the mover of each node before round_taken passed and the mover at
+    round_taken took.
+    """
+    num_nodes = max(config.num_nodes for config in games.values())
+    counts = np.zeros((len(games), num_nodes, 2))
+    nodes = np.arange(1, num_nodes + 1)
+    for i, r in enumerate(games):
+        taken = df_clean[f"game_{r}.take"].to_numpy(dtype=float) == 1
+        end_nodes = df_clean[f"game_{r}.round_taken"].to_numpy(dtype=float)[taken]
+        counts[i, :, 0] = (nodes == end_nodes[:, None]).sum(axis=0)
+        counts[i, :, 1] = (nodes < end_nodes[:, None]).sum(axis=0)
+    return counts
+
+
+def statistics_frame(counts, games=GAMES):
+    """The counts of sufficient_statistics as a tidy dataframe with the role of each mover."""
+    g, n = np.meshgrid(list(games), np.arange(1, counts.shape[1] + 1), indexing="ij")
+    return pd.DataFrame({
+        "game": g.ravel(),
+        "node": n.ravel(),
+        "role": np.where(n.ravel() % 2 == 1, 1, 2),
+        "takes": counts[:, :, 0].ravel(),
+        "passes": counts[:, :, 1].ravel(),
+    })
+
+
+def _logit(x):
+    return np.exp(-np.logaddexp(0, -x))
+
+
+def _induction(payoffs, precision, role=None, opponent=None):
+    """Logit take probabilities per node and their derivative in the precision.
+
+    The mover always takes at the last node, the only choice the apps offer
+    there. With role set, only the nodes of that role respond to payoffs; at
+    the other nodes the mover follows the fixed (probability, derivative)
+    pair opponent, as level-k players assume of the level below them.
+    """
+    num_nodes = payoffs.shape[0] - 1
+    p, dp = np.zeros(num_nodes), np.zeros(num_nodes)
+    p[-1] = 1.0
+    value, d_value = payoffs[num_nodes - 1], np.zeros(2)
+    for node in range(num_nodes - 1, 0, -1):
+        i = node - 1
+        mover = i % 2
+        take = payoffs[i]
+        if role is None or mover == role:
+            gain = take[mover] - value[mover]
+            p[i] = _logit(precision * gain)
+            dp[i] = p[i] * (1 - p[i]) * (gain - precision * d_value[mover])
+        else:
+            p[i], dp[i] = opponent[0][i], opponent[1][i]
+        value, d_value = p[i] * take + (1 - p[i]) * value, dp[i] * (take - value) + (1 - p[i]) * d_value
+    return p, dp
+
+
+def _level_k(payoffs, precision, levels):
+    """Take probabilities and precision derivatives of levels 0..levels, shape (levels + 1, nodes)."""
+    num_nodes = payoffs.shape[0] - 1
+    p = [np.append(np.full(num_nodes - 1, 0.5), 1.0)]
+    dp = [np.zeros(num_nodes)]
+    own_nodes = np.arange(num_nodes) % 2
+    for _ in range(levels):
+        below = (p[-1], dp[-1])
+        by_role = [_induction(payoffs, precision, role, below) for role in (0, 1)]
+        p.append(np.where(own_nodes == 0, by_role[0][0], by_role[1][0]))
+        dp.append(np.where(own_nodes == 0, by_role[0][1], by_role[1][1]))
+    return np.array(p), np.array(dp)
+
+
+def _binomial(counts, p, dp_dtheta):
+    """Log-likelihood and gradient from counts (nodes, 2) and dP/dtheta (params, nodes)."""
+    p = np.clip(p, 1e-12, 1 - 1e-12)
+    takes, passes = counts[:, 0], counts[:, 1]
+    ll = takes @ np.log(p) + passes @ np.log(1 - p)
+    return ll, dp_dtheta @ (takes / p - passes / (1 - p))
+
+
+def qre_loglik(theta, counts, tables):
+    """Negative log-likelihood and gradient of the agent logit QRE; theta = [log precision].
+
+    The forced take at the last node carries no information and is left out.
+    """
+    precision = np.exp(theta[0])
+    ll, grad = 0.0, np.zeros(1)
+    for game_counts, payoffs in zip(counts, tables):
+        n = payoffs.shape[0] - 1
+        p, dp = _induction(payoffs, precision)
+        g_ll, g_grad = _binomial(game_counts[:n - 1], p[:-1], (precision * dp[:-1])[None, :])
+        ll, grad = ll + g_ll, grad + g_grad
+    return -ll, -grad
+
+
+def levelk_loglik(theta, counts, tables, levels):
+    """Negative log-likelihood and gradient of a logit level-k mixture.
+
+    theta = [log precision, softmax weights of levels 0..levels]; the mixture
+    is over decisions, which keeps the likelihood a function of the node
+    counts alone. The last node is left out, as in qre_loglik.
+    """
+    precision = np.exp(theta[0])
+    weights = np.exp(theta[1:] - theta[1:].max())
+    weights /= weights.sum()
+    ll, grad = 0.0, np.zeros_like(theta)
+    for game_counts, payoffs in zip(counts, tables):
+        n = payoffs.shape[0] - 1
+        p_k, dp_k = _level_k(payoffs, precision, levels)
+        p = weights @ p_k
+        dp_dtheta = np.vstack([precision * (weights @ dp_k), weights[:, None] * (p_k - p)])
+        g_ll, g_grad = _binomial(game_counts[:n - 1], p[:-1], dp_dtheta[:, :-1])
+        ll, grad = ll + g_ll, grad + g_grad
+    return -ll, -grad
+
+
+def _fit_once(model, x0, counts, tables, levels):
+    if model == "qre":
+        fun, args = qre_loglik, (counts, tables)
+    else:
+        fun, args = levelk_loglik, (counts, tables, levels)
+    result = minimize(fun, x0, args=args, jac=True, method="L-BFGS-B")
+    return result.fun, result.x
+
+
+def fit(df_clean, model="qre", levels=2, starts=16, jobs=None, seed=0, games=GAMES):
+    """Maximum-likelihood fit with several random starts; returns (log-likelihood, parameters)."""
+    counts = sufficient_statistics(df_clean, games)
+    tables = [np.asarray(config.payoffs, dtype=float) for config in games.values()]
+    rng = np.random.default_rng(seed)
+    size = 1 if model == "qre" else levels + 2
+    x0s = rng.normal(scale=2.0, size=(starts, size))
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        results = list(pool.map(
+            _fit_once, [model] * starts, x0s, [counts] * starts, [tables] * starts, [levels] * starts
+        ))
+    neg_ll, theta = min(results, key=lambda r: r[0])
+
+    params = {"precision": float(np.exp(theta[0]))}
+    if model == "levelk":
+        weights = np.exp(theta[1:] - theta[1:].max())
+        params.update({f"level_{k}": float(w) for k, w in enumerate(weights / weights.sum())})
+    return -neg_ll, params
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fit QRE and level-k models to cleaned centipede data.")
+    parser.add_argument("input", help="output of data_clean.py")
+    parser.add_argument("-m", "--model", choices=["qre", "levelk"], default="qre")
+    parser.add_argument("-k", "--levels", type=int, default=2, help="highest level of the level-k model")
+    parser.add_argument("-s", "--starts", type=int, default=16, help="random starting points")
+    parser.add_argument("-j", "--jobs", type=int, help="worker processes (default: number of CPUs)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--config", default="centipede", help="session config whose games were played")
+    args = parser.parse_args(argv)
+
+    games = {config.game: config for config in session_schedule(args.config)}
+    df_clean = read(args.input)
+    print(statistics_frame(sufficient_statistics(df_clean, games), games).to_string(index=False))
+    ll, params = fit(df_clean, args.model, args.levels, args.starts, args.jobs, args.seed, games)
+    print(f"log-likelihood: {ll:.3f}")
+    for name, value in params.items():
+        print(f"{name}: {value:.4f}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
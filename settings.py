@@ -3,18 +3,66 @@ from os import environ
 DEBUG = False
 
 SESSION_CONFIG_DEFAULTS = dict(
-    real_world_currency_per_point=1.00, participation_fee=0.00, doc=""
+    real_world_currency_per_point=1.00, participation_fee=0.00, doc="",
+    # 'fixed' pairs from session creation, 'arrival' pairs players in the
+    # order they open the session, 'stranger' pairs new partners in every game
+    # and, when none is waiting, a past partner after stranger_patience seconds
+    matching='fixed',
+    stranger_patience=60,
+    # seconds per decision (0 for none, or a list with one per node); a mover
+    # who times out passes or takes by timeout_policy, and dropout_timeouts
+    # timeouts in a row get a participant played automatically. Live pages
+    # time out each node on the server while a browser is connected; their
+    # page timeout, the sum over the nodes, only covers both browsers closing.
+    # Results times out after the first node's seconds and counts as a timeout
+    decision_timeout=0,
+    timeout_policy='pass',
+    dropout_timeouts=2,
 )
 
+# games played in order by the centipede_game app: the GameConfig parameters
+# of each (first_mover, large_pile, small_pile, base, num_nodes) and how many
+# times to repeat it, see centipede.config.schedule
+FOUR_GAMES = [
+    dict(first_mover=1),
+    dict(first_mover=2),
+    dict(first_mover=1),
+    dict(first_mover=2),
+]
+
 SESSION_CONFIGS = [
     dict(
         name='centipede',
         display_name="Centipede Game",
         num_demo_participants=2,
-        app_sequence=['centipede_game_1', 'centipede_game_2', 'centipede_game_3', 'centipede_game_4'],
+        app_sequence=['centipede_game'],
+        games=FOUR_GAMES,
+    ),
+    dict(
+        name='centipede_live',
+        display_name="Centipede Game (live pages)",
+        num_demo_participants=2,
+        app_sequence=['centipede_game'],
+        games=FOUR_GAMES,
+        live_decisions=True,
+    ),
+    dict(
+        name='centipede_stranger',
+        display_name="Centipede Game (new partner in every game)",
+        num_demo_participants=4,
+        app_sequence=['centipede_game'],
+        games=FOUR_GAMES,
+        matching='stranger',
     ),
 ]
 
+# every session of the app gets the rounds of the longest games list above
+# (see centipede_game.Constants.num_rounds), so longer designs are only added
+# to SESSION_CONFIGS for the studies that play them, e.g.
+#     dict(name='centipede_repeated', display_name="Centipede Game (20 games)",
+#          num_demo_participants=2, app_sequence=['centipede_game'], games=TWENTY_GAMES)
+TWENTY_GAMES = [dict(first_mover=1 + i % 2) for i in range(20)]
+
 # ISO-639 code
 # for example: de, fr, ja, ko, zh-hans
 LANGUAGE_CODE = 'en'